@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+batch_gen.py
+
+Validates many single-bundle specs and generates .uml + .puml for each valid
+one, in parallel (one worker process per CPU). Bundles are independent, so
+this amortizes interpreter startup across the whole batch: caps.json and the
+template are loaded once and handed to every worker, and each spec is parsed
+once and shared by validation and both generators.
+
+Each spec writes into its own folder, <out_dir>/<spec file name>/, so specs
+that share a bundle_name do not overwrite each other. Specs whose file names
+collide (same name in different folders) are rejected up front.
+
+A spec that cannot be read, fails validation or breaks a generator is
+reported and skipped (nothing is generated for it); the rest of the batch
+keeps going.
+
+Exit codes:
+  0 -> every spec validated and was generated
+  1 -> at least one spec was rejected, invalid or failed to generate
+  2 -> Wrong CLI usage / no spec matched the pattern
+"""
+
+import glob
+import os
+import sys
+from multiprocessing import Pool
+
+import gen_puml_from_spec
+import gen_uml_from_spec
+import validate_spec
+
+# Per-worker inputs shared by every bundle (set once by init_worker).
+_CAPS: dict = {}
+_TPL = ""
+_OUT_DIR = ""
+
+
+def init_worker(caps_root: dict, tpl: str, out_dir: str) -> None:
+    """Pool initializer: keep the parsed caps.json and template in this worker."""
+    global _CAPS, _TPL, _OUT_DIR
+    _CAPS, _TPL, _OUT_DIR = caps_root, tpl, out_dir
+
+
+def spec_name(spec_path: str) -> str:
+    """Output folder name for a spec: its file name without extension."""
+    return os.path.splitext(os.path.basename(spec_path))[0]
+
+
+def run_bundle(spec_path: str) -> tuple[str, list[str], list[str]]:
+    """
+    Validate one spec and, if it is valid, generate its .uml and .puml.
+    Any exception is reported as that spec's error instead of ending the batch.
+
+    Returns:
+        (spec_path, errors, generated file paths)
+    """
+    try:
+        spec = validate_spec.load(spec_path)
+
+        errs = validate_spec.process_one(spec, _CAPS)
+        if errs:
+            return spec_path, errs, []
+
+        out_dir = os.path.join(_OUT_DIR, spec_name(spec_path))
+        outputs = [
+            gen_uml_from_spec.process_one(spec, _TPL, out_dir),
+            gen_puml_from_spec.process_one(spec, out_dir),
+        ]
+    except Exception as e:
+        return spec_path, [f"{type(e).__name__}: {e}"], []
+
+    return spec_path, [], outputs
+
+
+def report(spec_path: str, errs: list[str], outputs: list[str]) -> None:
+    """Print one spec's result: FAILED + errors, or OK + generated paths."""
+    if errs:
+        print(f"{spec_path}: FAILED")
+        for e in errs:
+            print(f"- {e}")
+    else:
+        print(f"{spec_path}: OK")
+        for out_path in outputs:
+            print(f"  {out_path}")
+
+
+def main() -> None:
+    if len(sys.argv) != 5:
+        print(
+            "Usage: batch_gen.py <spec_glob> <caps.json> <template.tpl> <out_dir>",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+
+    pattern, caps_path, tpl_path, out_dir = sys.argv[1:5]
+
+    spec_paths = sorted(glob.glob(pattern, recursive=True))
+    if not spec_paths:
+        print(f"No specs match: {pattern}", file=sys.stderr)
+        sys.exit(2)
+
+    # Shared inputs are read once here, so a bad caps.json/template fails fast.
+    caps_root = validate_spec.load(caps_path)
+    with open(tpl_path, "r", encoding="utf-8") as f:
+        tpl = f.read()
+
+    # Specs sharing a file name would share an output folder; reject them all.
+    by_name: dict[str, list[str]] = {}
+    for p in spec_paths:
+        by_name.setdefault(spec_name(p), []).append(p)
+
+    failed = 0
+    jobs: list[str] = []
+    for name, paths in by_name.items():
+        if len(paths) > 1:
+            for p in paths:
+                failed += 1
+                report(p, [f"Output folder {name} is shared with: {paths}"], [])
+        else:
+            jobs.extend(paths)
+
+    # Results arrive in completion order; each line is prefixed with its spec.
+    with Pool(initializer=init_worker, initargs=(caps_root, tpl, out_dir)) as pool:
+        for spec_path, errs, outputs in pool.imap_unordered(run_bundle, jobs):
+            if errs:
+                failed += 1
+            report(spec_path, errs, outputs)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,25 @@
 #!/usr/bin/env python3
-import json, os, sys
+import os, sys
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: gen_puml_from_spec.py <spec.json> <out_dir>", file=sys.stderr)
-        sys.exit(2)
+# orjson is optional
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
 
-    spec_path, out_dir = sys.argv[1], sys.argv[2]
-    with open(spec_path, "r", encoding="utf-8") as f:
-        spec = json.load(f)
+def esc(s: str) -> str:
+    # Keep PlantUML text safe (most strings have no line breaks at all)
+    if "\r" in s or "\n" in s:
+        return s.replace("\r", "").replace("\n", "\\n")
+    return s
 
+def process_one(spec, out_dir):
+    """Generate the .puml preview for one parsed spec and return its path."""
     bundle = spec.get("bundle_name", "Bundle1")
     states = spec.get("states", [])
     transitions = spec.get("transitions", [])
     devices = spec.get("devices", [])
 
-    def esc(s: str) -> str:
-        # Keep PlantUML text safe
-        return s.replace("\r", "").replace("\n", "\\n")
-
     lines = []
     lines.append("@startuml")
     lines.append(f'title Bundle: {esc(bundle)} — State Machine Preview')
@@ -53,11 +54,12 @@ def main():
         "  == Devices ==",
     ]
 
-    for d in devices:
-        did = d.get("id", "")
-        dtype = d.get("type", "")
-        attrs = ", ".join(d.get("attributes", []))
-        lines.append(f"  {esc(did)} : {esc(dtype)}  (attrs: {esc(attrs)})")
+    if devices:
+        lines.append("\n".join(
+            f"  {esc(d.get('id', ''))} : {esc(d.get('type', ''))}"
+            f"  (attrs: {esc(', '.join(d.get('attributes', [])))})"
+            for d in devices
+        ))
 
     lines += [
         "end legend",
@@ -74,27 +76,27 @@ def main():
         sid = s.get("id", "")
         if not sid:
             continue
+        sid = esc(sid)
         # Declare state (no braces)
-        lines.append(f'state "{esc(sid)}" as {esc(sid)}')
+        lines.append(f'state "{sid}" as {sid}')
         invs = s.get("invariants", [])
         if invs:
-            lines.append(f"note right of {esc(sid)}")
-            lines.append("  == invariants ==")
-            for iv in invs:
-                lines.append(f"  {esc(iv)}")
-            lines.append("end note")
+            lines.append("\n".join([
+                f"note right of {sid}",
+                "  == invariants ==",
+                *(f"  {esc(iv)}" for iv in invs),
+                "end note",
+            ]))
     lines.append("")
 
     # Transitions
-    for t in transitions:
-        src = t.get("source", "")
-        tgt = t.get("target", "")
-        trig = t.get("trigger", "")
-        act = t.get("action", "")
-        if not src or not tgt:
-            continue
-        label = esc(trig) + (f" / {esc(act)}" if act else "")
-        lines.append(f"{esc(src)} --> {esc(tgt)} : {label}")
+    edges = [t for t in transitions if t.get("source") and t.get("target")]
+    if edges:
+        lines.append("\n".join(
+            f"{esc(t['source'])} --> {esc(t['target'])} : {esc(t.get('trigger', ''))}"
+            + (f" / {esc(t['action'])}" if t.get("action") else "")
+            for t in edges
+        ))
     lines.append("")
 
     # Optional final node
@@ -106,9 +108,22 @@ def main():
 
     os.makedirs(out_dir, exist_ok=True)
     out_path = os.path.join(out_dir, f"Bundle_{bundle}.puml")
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
-    print(out_path)
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        # Stream lines instead of building one big "\n".join string
+        f.write(lines[0])
+        f.writelines(f"\n{line}" for line in lines[1:])
+    return out_path
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: gen_puml_from_spec.py <spec.json> <out_dir>", file=sys.stderr)
+        sys.exit(2)
+
+    spec_path, out_dir = sys.argv[1], sys.argv[2]
+    with open(spec_path, "rb") as f:
+        spec = _loads(f.read())
+
+    print(process_one(spec, out_dir))
 
 if __name__ == "__main__":
     main()
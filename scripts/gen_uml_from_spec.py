@@ -25,32 +25,49 @@ Deterministic ids:
 """
 
 import html
-import json
 import os
 import sys
 import re
 
+# orjson is optional
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
 
 def h(x: str) -> str:
     """XML-escape a string for element text or attribute usage."""
-    return html.escape(x, quote=True)
+    # Most spec strings contain nothing to escape; C-level membership tests
+    # let those skip html.escape's replace passes entirely.
+    if "&" in x or "<" in x or ">" in x or '"' in x or "'" in x:
+        return html.escape(x, quote=True)
+    return x
+
+
+def h_text(x: str) -> str:
+    """XML-escape a string for element text only (use h() for attribute values)."""
+    # Element text only needs &, < and > escaped; quotes matter inside attributes.
+    if "&" in x or "<" in x or ">" in x:
+        return x.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return x
 
 
 # --- Normalization to match the example bundle vocabulary used by MDSSED's SMV translator ---
-_NOTPRESENT_EQ  = re.compile(r'(presenceSensor\.presence\s*==\s*)"notpresent"')
-_NOTPRESENT_NEQ = re.compile(r'(presenceSensor\.presence\s*!=\s*)"notpresent"')
+_NOTPRESENT = re.compile(r'(presenceSensor\.presence\s*(?:==|!=)\s*)"notpresent"')
 
 def normalize_expr(expr: str) -> str:
     """
     Normalize tokens so the Verify->SMV generator recognizes them.
     We keep JSON strict ("notpresent") and only adapt when writing UML.
     """
-    expr = _NOTPRESENT_EQ.sub(r'\1"not present"', expr)
-    expr = _NOTPRESENT_NEQ.sub(r'\1"not present"', expr)
-    return expr
+    # Nearly every atom lacks the token; skip the regex pass for those.
+    if "notpresent" not in expr:
+        return expr
+    return _NOTPRESENT.sub(r'\1"not present"', expr)
 
 
-def make_state_nodes(states, state_xmi_ids) -> list[str]:
+def make_state_nodes(states) -> list[str]:
     """
     Create the region's subvertex list:
       - initial pseudostate (init_1)
@@ -60,16 +77,16 @@ def make_state_nodes(states, state_xmi_ids) -> list[str]:
     out = []
     out.append('      <subvertex xmi:type="uml:Pseudostate" xmi:id="init_1"/>')
     for s in states:
-        sid = s["id"]
+        sid = h(s["id"])  # escaped once, used for both xmi:id and name
         out.append(
             f'      <subvertex xmi:type="uml:State" '
-            f'xmi:id="{state_xmi_ids[sid]}" name="{h(sid)}"/>'
+            f'xmi:id="s_{sid}" name="{sid}"/>'
         )
     out.append('      <subvertex xmi:type="uml:FinalState" xmi:id="final_1"/>')
     return out
 
 
-def make_transitions(states, transitions, state_xmi_ids) -> list[str]:
+def make_transitions(states, transitions) -> list[str]:
     """
     Create transitions:
       - t_init: init_1 -> first state in spec['states']
@@ -78,25 +95,22 @@ def make_transitions(states, transitions, state_xmi_ids) -> list[str]:
     out = []
 
     # Initial transition to the first declared state (deterministic)
-    first_sid = states[0]["id"]
+    first_sid = h(states[0]["id"])
     out.append(
         f'      <transition xmi:type="uml:Transition" '
-        f'xmi:id="t_init" source="init_1" target="{state_xmi_ids[first_sid]}"/>'
+        f'xmi:id="t_init" source="init_1" target="s_{first_sid}"/>'
     )
 
     # User transitions
     for i, tr in enumerate(transitions, start=1):
-        tid = f"t_{i}"
-        src = state_xmi_ids[tr["source"]]
-        tgt = state_xmi_ids[tr["target"]]
         out.append(
             f'      <transition xmi:type="uml:Transition" '
-            f'xmi:id="{tid}" source="{src}" target="{tgt}"/>'
+            f'xmi:id="t_{i}" source="s_{h(tr["source"])}" target="s_{h(tr["target"])}"/>'
         )
     return out
 
 
-def make_stereotypes(states, transitions, state_xmi_ids) -> list[str]:
+def make_stereotypes(states, transitions) -> list[str]:
     """
     Emit MDSSED blocks using the nested element style your example uses:
       - <MDSSED:states ...><state>...</state>...</MDSSED:states>
@@ -107,36 +121,73 @@ def make_stereotypes(states, transitions, state_xmi_ids) -> list[str]:
     out = []
 
     # States → MDSSED:states with multiple <state> children
-    inv_counter = 1
-    for s in states:
-        sid = s["id"]
-        base = state_xmi_ids[sid]
-        out.append(
-            f'  <MDSSED:states xmi:id="stinv_{inv_counter}" base_State="{base}">'
-        )
-        for iv in s.get("invariants", []):
-            out.append(f'    <state>{h(normalize_expr(iv))}</state>')
-        out.append('  </MDSSED:states>')
-        inv_counter += 1
+    for k, s in enumerate(states, start=1):
+        out.append("\n".join([
+            f'  <MDSSED:states xmi:id="stinv_{k}" base_State="s_{h(s["id"])}">',
+            *(f'    <state>{h_text(normalize_expr(iv))}</state>'
+              for iv in s.get("invariants", [])),
+            '  </MDSSED:states>',
+        ]))
 
     # Transitions → pair of trigger + action (skip t_init)
     for i, tr in enumerate(transitions, start=1):
-        tid = f"t_{i}"
-        out.append(
-            f'  <MDSSED:triggers xmi:id="trig_{i}" base_Transition="{tid}">'
-        )
-        out.append(f'    <trigger>{h(normalize_expr(tr["trigger"]))}</trigger>')
-        out.append('  </MDSSED:triggers>')
-
         out.append(
-            f'  <MDSSED:actions xmi:id="act_{i}" base_Transition="{tid}">'
+            f'  <MDSSED:triggers xmi:id="trig_{i}" base_Transition="t_{i}">\n'
+            f'    <trigger>{h_text(normalize_expr(tr["trigger"]))}</trigger>\n'
+            '  </MDSSED:triggers>\n'
+            f'  <MDSSED:actions xmi:id="act_{i}" base_Transition="t_{i}">\n'
+            f'    <action>{h_text(tr["action"])}</action>\n'
+            '  </MDSSED:actions>'
         )
-        out.append(f'    <action>{h(tr["action"])}</action>')
-        out.append('  </MDSSED:actions>')
 
     return out
 
 
+# Insertion markers in the template; the capture group keeps them in split() output.
+_MARKERS = re.compile(
+    "(<!-- BEGIN_STATE_NODES -->|<!-- BEGIN_TRANSITIONS -->|<!-- BEGIN_MDSSED_STEREOTYPES -->)"
+)
+
+
+def write_lines(f, lines) -> None:
+    """Write lines separated by newlines (like "\\n".join) without joining them first."""
+    it = iter(lines)
+    f.write(next(it, ""))
+    f.writelines(f"\n{line}" for line in it)
+
+
+def process_one(spec: dict, tpl: str, out_dir: str) -> str:
+    """Generate the .uml file for one parsed spec and template text; return its path."""
+    bundle = spec["bundle_name"]
+    states = spec["states"]
+    transitions = spec["transitions"]
+
+    # Build sections
+    state_xml = make_state_nodes(states)
+    trans_xml = make_transitions(states, transitions)
+    stereo_xml = make_stereotypes(states, transitions)
+
+    sections = {
+        "<!-- BEGIN_STATE_NODES -->": state_xml,
+        "<!-- BEGIN_TRANSITIONS -->": trans_xml,
+        "<!-- BEGIN_MDSSED_STEREOTYPES -->": stereo_xml,
+    }
+    tpl = tpl.replace("__BUNDLE_NAME__", f"Bundle_{h(bundle)}")
+
+    # Fill template and write output, streaming each section after its marker
+    # (no full-size output string is built)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, f"Bundle_{bundle}.uml")
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for piece in _MARKERS.split(tpl):
+            f.write(piece)
+            if piece in sections:
+                f.write("\n")
+                write_lines(f, sections[piece])
+
+    return out_path
+
+
 def main() -> None:
     if len(sys.argv) != 4:
         print(
@@ -147,42 +198,12 @@ def main() -> None:
 
     spec_path, tpl_path, out_dir = sys.argv[1], sys.argv[2], sys.argv[3]
 
-    with open(spec_path, "r", encoding="utf-8") as f:
-        spec = json.load(f)
+    with open(spec_path, "rb") as f:
+        spec = _loads(f.read())
     with open(tpl_path, "r", encoding="utf-8") as f:
         tpl = f.read()
 
-    bundle = spec["bundle_name"]
-    states = spec["states"]
-    transitions = spec["transitions"]
-
-    # Deterministic XMI ids for states
-    state_xmi_ids = {s["id"]: f's_{s["id"]}' for s in states}
-
-    # Build sections
-    state_xml = make_state_nodes(states, state_xmi_ids)
-    trans_xml = make_transitions(states, transitions, state_xmi_ids)
-    stereo_xml = make_stereotypes(states, transitions, state_xmi_ids)
-
-    # Fill template
-    out_xml = (
-        tpl
-        .replace("__BUNDLE_NAME__", f"Bundle_{h(bundle)}")
-        .replace("<!-- BEGIN_STATE_NODES -->",
-                 "<!-- BEGIN_STATE_NODES -->\n" + "\n".join(state_xml))
-        .replace("<!-- BEGIN_TRANSITIONS -->",
-                 "<!-- BEGIN_TRANSITIONS -->\n" + "\n".join(trans_xml))
-        .replace("<!-- BEGIN_MDSSED_STEREOTYPES -->",
-                 "<!-- BEGIN_MDSSED_STEREOTYPES -->\n" + "\n".join(stereo_xml))
-    )
-
-    # Write output
-    os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, f"Bundle_{bundle}.uml")
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(out_xml)
-
-    print(out_path)
+    print(process_one(spec, tpl, out_dir))
 
 
 if __name__ == "__main__":
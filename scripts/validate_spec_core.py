@@ -0,0 +1,339 @@
+"""
+validate_spec_core.py
+
+Validation rules used by validate_spec.py (devices, state invariants,
+triggers and actions). Errors are collected in ERRS rather than raised.
+
+Kept free of I/O and CLI handling so it can be compiled with mypyc for
+large specs; validate_spec.py imports whichever build is present:
+  cd scripts
+  mypyc validate_spec_core.py
+"""
+
+import re
+
+# Collect all errors here and print them at the end (deterministic order).
+ERRS: list[str] = []
+
+# Root causes already reported via err_once (e.g. one unknown device used by many atoms).
+_SEEN: set[tuple] = set()
+
+# Boolean operators between atoms; the capture group keeps them as tokens.
+_BOOL_SPLIT = re.compile(r"(&&|\|\|)")
+
+
+def is_ident(name: str) -> bool:
+    """True for an ASCII letter/underscore followed by Unicode letters, digits or underscores."""
+    if name.isascii():
+        return name.isidentifier()
+    if not name[0].isascii() or not (name[0].isalpha() or name[0] == "_"):
+        return False
+    # Same word-character rule as the old regex: alphanumeric or underscore
+    tail = name[1:].replace("_", "")
+    return not tail or tail.isalnum()
+
+
+def parse_atom(atom: str) -> tuple[str, str, str, str] | None:
+    """
+    Parse a single "atom" in a trigger/invariant:
+      <device>.<attribute> (==|!=) "<value>"
+    Returns (device, attribute, op, value), or None if the syntax is wrong.
+    The grammar is fixed and unambiguous, so plain string splitting is enough.
+    """
+    dev, dot, rest = atom.strip().partition(".")
+    if not dot or not is_ident(dev):
+        return None
+
+    # First operator occurrence; neither '=' nor '!' may appear in the attribute.
+    eq = rest.find("==")
+    ne = rest.find("!=")
+    if eq < 0 and ne < 0:
+        return None
+    if eq < 0 or 0 <= ne < eq:
+        i, op = ne, "!="
+    else:
+        i, op = eq, "=="
+
+    attr = rest[:i].rstrip()
+    if not is_ident(attr):
+        return None
+
+    val = rest[i + 2:].strip()
+    if len(val) < 3 or val[0] != '"' or val[-1] != '"' or '"' in val[1:-1]:
+        return None
+
+    return dev, attr, op, val[1:-1]
+
+
+def parse_action(act: str) -> tuple[str, str] | None:
+    """
+    Parse an action:
+      <device>.<command>()
+    Returns (device, command), or None if the syntax is wrong.
+    """
+    call = act.strip()
+    if not call.endswith("()"):
+        return None
+
+    dev, dot, cmd = call[:-2].partition(".")
+    if not dot or not is_ident(dev) or not is_ident(cmd):
+        return None
+
+    return dev, cmd
+
+
+def reset() -> None:
+    """Clear collected errors so another spec can be validated in the same process."""
+    ERRS.clear()
+    _SEEN.clear()
+
+
+def err(msg: str) -> None:
+    """Record a validation error (no exceptions; we collect and report all)."""
+    ERRS.append(msg)
+
+
+def err_once(key: tuple, msg: str) -> None:
+    """Record a validation error only the first time its root cause `key` is seen."""
+    if key not in _SEEN:
+        _SEEN.add(key)
+        ERRS.append(msg)
+
+
+def validate_devices(spec: dict, caps_root: dict):
+    """
+    Validate the devices array:
+    - presence of 'devices' list,
+    - each device has id/type/attributes,
+    - type is known to caps.json,
+    - attributes listed exist for that type,
+    - required v1 devices exist: presenceSensor, motionSensor, switch.
+
+    Returns:
+        dev_map: { device_id -> (device_type, {attr -> allowed values}, allowed commands) }
+        caps_devices: shortcuts to caps_root['devices'] for convenience
+    """
+    if "devices" not in spec or not isinstance(spec["devices"], list):
+        err("Missing devices[]")
+        return {}, {}
+
+    dev_map: dict[str, tuple[str, dict[str, frozenset[str]], frozenset[str]]] = {}
+    caps_devices = caps_root.get("devices", {})
+
+    # One shared entry per device type, so every atom check is a single lookup.
+    type_caps = {
+        dtype: (
+            dtype,
+            {attr: frozenset(vals) for attr, vals in c["attributes"].items()},
+            frozenset(c["actions"]),
+        )
+        for dtype, c in caps_devices.items()
+    }
+
+    for d in spec["devices"]:
+        if not all(k in d for k in ("id", "type", "attributes")):
+            err(f"Device missing keys: {d}")
+            continue
+
+        did = d["id"]
+        dtype = d["type"]
+
+        if dtype not in caps_devices:
+            err(f"Unknown device type: {dtype}")
+            continue
+
+        if did in dev_map:
+            err(f"Duplicate device id: {did}")
+
+        entry = dev_map[did] = type_caps[dtype]
+
+        # Check that the attributes list is a subset of allowed attributes for this type
+        # (the prebuilt per-type attribute dict serves as the set; no sets built per device).
+        want_attrs = entry[1]
+        got_attrs = d.get("attributes", ())
+        if not all(a in want_attrs for a in got_attrs):
+            invalid = sorted({a for a in got_attrs if a not in want_attrs})
+            err(f"Device {did} attributes invalid: {invalid}")
+
+    # v1 pipeline requires exactly these devices to exist
+    for must in ("presenceSensor", "motionSensor", "switch"):
+        if must not in dev_map:
+            err(f"Required device missing: {must}")
+
+    return dev_map, caps_devices
+
+
+def split_bool(expr: str, bool_ops: list[str]) -> list[str]:
+    """
+    Split an expression into tokens by boolean operators (&&, ||),
+    preserving the operators as tokens and trimming whitespace on atoms.
+    Example: 'a && b || c' -> ['a', '&&', 'b', '||', 'c']
+    """
+    # One C-level split yields atoms and operators alternately.
+    tokens = [t.strip() for t in _BOOL_SPLIT.split(expr)]
+    if not tokens[-1]:
+        tokens.pop()
+
+    return tokens
+
+
+def validate_atom(atom: str, dev_map: dict, ops: set[str]) -> None:
+    """
+    Validate a single atom against:
+    - correct syntax via parse_atom,
+    - known device and attribute for that device type,
+    - allowed operator (== or !=),
+    - allowed value for attribute.
+    """
+    parsed = parse_atom(atom)
+    if parsed is None:
+        err(f"Bad trigger atom: {atom}")
+        return
+
+    dev, attr, op, val = parsed
+
+    entry = dev_map.get(dev)
+    if entry is None:
+        err_once(("unknown_dev", dev), f"Unknown device in trigger: {dev}")
+        return
+
+    allowed = entry[1].get(attr)
+    if allowed is None:
+        err(f"Unknown attribute {dev}.{attr}")
+        return
+
+    if op not in ops:
+        err(f"Invalid operator {op} in {atom}")
+
+    if val not in allowed:
+        err(f"Invalid value {val} for {dev}.{attr}; allowed={sorted(allowed)}")
+
+
+def validate_states(spec: dict, dev_map: dict, ops: set[str]) -> set[str]:
+    """
+    Validate the states array: unique ids and invariant atoms (not AND/OR
+    chains) against known devices, attributes, operators and values.
+
+    Returns:
+        state_ids: ids of all declared states (for transition checks)
+    """
+    state_ids: set[str] = set()
+    states = spec.get("states")
+    if isinstance(states, list):
+        for st in states:
+            if "id" not in st:
+                err(f"State missing id: {st}")
+                continue
+
+            sid = st["id"]
+            if sid in state_ids:
+                err(f"Duplicate state id: {sid}")
+            state_ids.add(sid)
+
+            invs = st.get("invariants", [])
+            if not isinstance(invs, list):
+                err(f"State {sid} invariants must be list")
+                continue
+
+            for iv in invs:
+                # State invariants are atoms (not OR/AND chains).
+                parsed = parse_atom(iv)
+                if parsed is None:
+                    err(f"Bad invariant atom in state {sid}: {iv}")
+                    continue
+
+                dev, attr, op, val = parsed
+
+                entry = dev_map.get(dev)
+                if entry is None:
+                    err(f"Unknown device in invariant: {dev}")
+                    continue
+
+                attrs = entry[1]
+                if attr not in attrs:
+                    err(f"Unknown attribute {dev}.{attr} in invariant")
+                    continue
+
+                if op not in ops:
+                    err(f"Invalid operator {op} in invariant")
+
+                if val not in attrs[attr]:
+                    err(f"Invalid value {val} for {dev}.{attr} in invariant")
+
+    return state_ids
+
+
+def validate_transitions(
+    spec: dict,
+    state_ids: set[str],
+    dev_map: dict,
+    bool_ops: list[str],
+    ops: set[str],
+) -> None:
+    """
+    Validate the transitions array: required keys, source/target refer to
+    declared states, trigger grammar and action grammar.
+    Trigger and action checks are fused into one pass over each transition.
+    """
+    transitions = spec.get("transitions")
+    if not isinstance(transitions, list):
+        return
+
+    # Hot loop: bind helpers and lookups to locals once.
+    lookup_dev = dev_map.get
+    tokenize = split_bool
+    check_atom = validate_atom
+    parse_act = parse_action
+    bool_op_set = frozenset(bool_ops)
+
+    for i, tr in enumerate(transitions, start=1):
+        for k in ("source", "target", "trigger", "action"):
+            if k not in tr:
+                err(f"Transition {i} missing {k}")
+
+        src = tr.get("source")
+        tgt = tr.get("target")
+
+        if src not in state_ids:
+            err(f"Transition {i} unknown source: {src}")
+        if tgt not in state_ids:
+            err(f"Transition {i} unknown target: {tgt}")
+
+        # Trigger (AND/OR of atoms). Pattern: atom ( (&&|||) atom )*
+        tokens = tokenize(tr.get("trigger", ""), bool_ops)
+        expect_atom = True
+        for tok in tokens:
+            if expect_atom:
+                # We expect an atom next.
+                check_atom(tok, dev_map, ops)
+                expect_atom = False
+            else:
+                # We expect a boolean operator next.
+                if tok not in bool_op_set:
+                    err(f"Expected boolean op between atoms, got: {tok}")
+                expect_atom = True
+
+        # Expression should not end with an operator.
+        if tokens and expect_atom:
+            err("Trigger expression ends with operator")
+
+        # Action: '<device>.<command>()' with a command allowed for the device type.
+        act = tr.get("action", "")
+        parsed = parse_act(act)
+        if parsed is None:
+            err(f"Bad action syntax: {act}")
+            continue
+
+        dev, cmd = parsed
+
+        entry = lookup_dev(dev)
+        if entry is None:
+            err_once(("unknown_dev", dev), f"Unknown device in action: {dev}")
+            continue
+
+        dtype, _, allowed = entry
+        if cmd not in allowed:
+            err(
+                f"Command {cmd} not allowed for {dev} (type {dtype}); "
+                f"allowed={sorted(allowed)}"
+            )